@@ -1,88 +1,196 @@
-import requests
-import time
+import asyncio
 import logging
-import urllib.parse
-from typing import Dict, List, Optional, Union
+import operator
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import aiohttp
+import orjson
+
+# Fields that may hold the list of names in a dict response, in order of preference
+RESULT_FIELDS = ('results', 'suggestions', 'names')
+
+# Statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header into a number of seconds to wait.
+
+    Args:
+        value: Header value, either delay-seconds or an HTTP-date
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def _as_list(data: Any) -> List[str]:
+    """Return a response that is already a list of names, rejecting any other shape."""
+    if not isinstance(data, list):
+        raise TypeError(f"Expected a list response, got {type(data)}")
+    return data
+
+class TransientAPIError(Exception):
+    """Raised when a request failed in a way that is worth retrying."""
+
+    def __init__(self, version: str, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.version = version
+        # Seconds the server asked us to wait, if it said
+        self.retry_after = retry_after
+
+class RateLimitExceeded(TransientAPIError):
+    """Raised when the API rejects a request for exceeding its rate limit."""
+
+    def __init__(self, version: str, retry_after: Optional[float] = None):
+        super().__init__(version, f"Rate limit exceeded for {version}", retry_after)
 
 class AutocompleteAPIClient:
     """Client for interacting with the autocomplete API."""
-    
-    def __init__(self, base_url: str = "http://35.200.185.69:8000"):
+
+    def __init__(self,
+                 base_url: str = "http://35.200.185.69:8000",
+                 pool_size: int = 64,
+                 keepalive_timeout: int = 75):
         self.base_url = base_url
-        self.session = requests.Session()
+        # Endpoint URLs for the known versions, built once instead of on every request
+        self._urls = {v: f"{base_url}/{v}/autocomplete" for v in ("v1", "v2", "v3")}
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Per-version callables that pull the names out of a decoded response,
+        # resolved from the first successful response of each version
+        self._extractors: Dict[str, Callable[[Any], List[str]]] = {}
         self.logger = logging.getLogger(__name__)
-    
-    def get_autocomplete_suggestions(self,
-                                   query: str, 
-                                   version: str = "v1",
-                                   max_retries: int = 3,
-                                   retry_delay: int = 60) -> List[str]:
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the pooled HTTP session, creating it on first use.
+
+        The session is created lazily so that it binds to the running event loop.
+        """
+        if self.session is None or self.session.closed:
+            # Every request goes to the same host, so let it use the whole pool
+            connector = aiohttp.TCPConnector(limit=self.pool_size,
+                                             limit_per_host=self.pool_size,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self):
+        """Close the underlying HTTP session and its connection pool."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _resolve_extractor(self, data: Any) -> Optional[Callable[[Any], List[str]]]:
+        """
+        Work out how to pull the names out of a decoded response.
+
+        Args:
+            data: The decoded JSON response
+
+        Returns:
+            A callable extracting the names, or None if the format is not recognized
+        """
+        # Handle different response formats
+        if isinstance(data, list):
+            return _as_list  # Direct list of names
+        elif isinstance(data, dict):
+            # Try common fields for results
+            for field in RESULT_FIELDS:
+                if field in data:
+                    return operator.itemgetter(field)
+            # If we can't find a specific field, log and return empty
+            self.logger.warning(f"Unknown response format: {data}")
+            return None
+        else:
+            self.logger.warning(f"Unexpected response type: {type(data)}")
+            return None
+
+    def _parse_response(self, version: str, body: bytes) -> List[str]:
+        """
+        Decode a successful response body into a list of names.
+
+        Args:
+            version: API version the response came from
+            body: The raw response body
+
+        Returns:
+            List of autocomplete suggestions
+        """
+        data = orjson.loads(body)
+        extractor = self._extractors.get(version)
+        if extractor is not None:
+            try:
+                return extractor(data)
+            except (KeyError, TypeError):
+                # The response shape changed; detect it again below
+                del self._extractors[version]
+
+        extractor = self._resolve_extractor(data)
+        if extractor is None:
+            return []
+        self._extractors[version] = extractor
+        return extractor(data)
+
+    async def get_autocomplete_suggestions(self, query: str, version: str = "v1") -> List[str]:
         """
         Get autocomplete suggestions for a query.
-        
+
         Args:
             query: The query string to autocomplete
             version: API version (v1, v2, or v3)
-            max_retries: Maximum number of retries on rate limit
-            retry_delay: Delay in seconds before retrying after rate limit
-            
+
         Returns:
             List of autocomplete suggestions
+
+        Raises:
+            RateLimitExceeded: If the API rejects the request with a 429
+            TransientAPIError: On a transient server or connection error. Retries are
+                left to the caller, which sends them through its rate limiter so every
+                request counts against the budget.
         """
-        url = f"{self.base_url}/{version}/autocomplete"
+        url = self._urls.get(version) or f"{self.base_url}/{version}/autocomplete"
         # Properly encode the query parameter
         params = {"query": query}
-        
-        for attempt in range(max_retries + 1):
-            try:
-                response = self.session.get(url, params=params)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    # Handle different response formats
-                    if isinstance(data, list):
-                        return data  # Direct list of names
-                    elif isinstance(data, dict):
-                        # Try common fields for results
-                        if 'results' in data:
-                            return data['results']
-                        elif 'suggestions' in data:
-                            return data['suggestions']
-                        elif 'names' in data:
-                            return data['names']
-                        else:
-                            # If we can't find a specific field, log and return empty
-                            self.logger.warning(f"Unknown response format: {data}")
-                            return []
-                    else:
-                        self.logger.warning(f"Unexpected response type: {type(data)}")
-                        return []
-                
-                if response.status_code == 429:  # Rate limit exceeded
-                    self.logger.warning(f"Rate limit exceeded for {version}: {response.text}")
-                    if attempt < max_retries:
-                        # Calculate retry delay based on response headers if available
-                        retry_after = response.headers.get('Retry-After')
-                        if retry_after and retry_after.isdigit():
-                            wait_time = int(retry_after)
-                        else:
-                            wait_time = retry_delay
-                        
-                        self.logger.info(f"Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        self.logger.error(f"Max retries reached for {query}")
-                        return []
-                
-                self.logger.error(f"Error {response.status_code}: {response.text}")
-                return []
-                
-            except Exception as e:
-                self.logger.error(f"Exception during API call: {str(e)}")
-                if attempt < max_retries:
-                    time.sleep(retry_delay)
-                    continue
-                return []
-        
-        return []
+        session = self._get_session()
+
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 200:
+                    return self._parse_response(version, await response.read())
+
+                if response.status not in RETRY_STATUSES:
+                    self.logger.error(f"Error {response.status}: {await response.text()}")
+                    return []
+
+                retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                if response.status == 429:  # Rate limit exceeded
+                    self.logger.warning(f"Rate limit exceeded for {version}: {await response.text()}")
+                    raise RateLimitExceeded(version, retry_after)
+
+                self.logger.warning(f"Server error {response.status} for {version}: {await response.text()}")
+                raise TransientAPIError(version, f"Server error {response.status} for {version}", retry_after)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, orjson.JSONDecodeError) as e:
+            self.logger.error(f"Exception during API call: {str(e)}")
+            raise TransientAPIError(version, f"Request for {query} failed: {str(e)}") from e
+
+# Shared by all extractors so they reuse one connection pool
+SHARED_CLIENT = AutocompleteAPIClient()
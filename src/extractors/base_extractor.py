@@ -1,23 +1,54 @@
+import asyncio
 import os
 import json
 import logging
+import pickle
+import re
 import time
-from typing import List, Set, Dict, Optional
+from typing import BinaryIO, Callable, List, Sequence, Set, Dict, Optional
 from abc import ABC, abstractmethod
 
-from src.api_client import AutocompleteAPIClient
-from src.utils.rate_limiter import VersionedRateLimiter
+import orjson
+
+from src.api_client import SHARED_CLIENT, RateLimitExceeded, TransientAPIError
+from src.scheduler import ExtractionScheduler
+from src.utils.rate_limiter import SHARED_LIMITER, get_backoff
+
+# Prefixes that cause traversal problems: consecutive spaces, or a leading or
+# trailing space on anything longer than a single space
+_INVALID_PREFIX = re.compile(r'  |^ .|. $')
 
 class BaseExtractor(ABC):
     """Base class for name extractors."""
     
+    # Requests between full checkpoints; requests in between are journaled
+    CHECKPOINT_INTERVAL = 500
+    # Requests between progress log messages
+    PROGRESS_INTERVAL = 20
+    # Times a query is retried after a rate limit or transient error
+    MAX_RETRIES = 5
+    # Base backoff in seconds when a failed response gives no Retry-After
+    RETRY_BACKOFF = 2.0
+    # Longest prefix that will be queried
+    MAX_PREFIX_LENGTH = 10
+    # Workers per version. Tokens come at a couple per second per version, so a few
+    # workers keep requests in flight; more would only hold prefixes while they wait
+    # on the rate limiter.
+    MAX_CONCURRENCY = 4
+    
     def __init__(self, 
                  version: str,
                  checkpoint_dir: str,
                  results_dir: str):
         self.version = version
-        self.api_client = AutocompleteAPIClient()
-        self.rate_limiter = VersionedRateLimiter()
+        self.api_client = SHARED_CLIENT
+        self.rate_limiter = SHARED_LIMITER
+        # Number of workers, bounded by this version's share of the shared connection pool
+        # so a worker that has been granted a request never waits on a socket
+        pool_share = max(1, self.api_client.pool_size // len(self.rate_limiter.limiters))
+        self.concurrency = min(self.MAX_CONCURRENCY,
+                               self.rate_limiter.get_limiter(version).requests_per_minute,
+                               pool_share)
         self.checkpoint_dir = checkpoint_dir
         self.results_dir = results_dir
         self.logger = logging.getLogger(__name__)
@@ -28,45 +59,119 @@ class BaseExtractor(ABC):
         
         # Initialize state
         self.names: Set[str] = set()
+        # Every prefix that has been queued or queried, so none is scheduled twice
         self.visited_prefixes: Set[str] = set()
+        # Prefixes waiting to be queried; this frontier is what a resumed run continues from.
+        # Shortest prefixes go first, so it can hold most of a level of the prefix tree, but
+        # it never holds the levels already queried the way the visited set does.
+        self.pending: Optional[Set[str]] = None
         self.request_count: int = 0
+        self._start_time: float = 0.0
+        self._journal: Optional[BinaryIO] = None
+        self._get_children = self._build_child_generator()
         
         # Load checkpoint if exists
         self._load_checkpoint()
     
     def _get_checkpoint_path(self) -> str:
         """Get the path to the checkpoint file."""
+        return os.path.join(self.checkpoint_dir, f"{self.version}_checkpoint.pkl")
+    
+    def _get_legacy_checkpoint_path(self) -> str:
+        """Get the path to a checkpoint written by an older version in JSON."""
         return os.path.join(self.checkpoint_dir, f"{self.version}_checkpoint.json")
     
+    def _get_journal_path(self) -> str:
+        """Get the path to the journal of requests made since the last checkpoint."""
+        return os.path.join(self.checkpoint_dir, f"{self.version}_names.jsonl")
+    
     def _get_results_path(self) -> str:
         """Get the path to the results file."""
         return os.path.join(self.results_dir, f"{self.version}_names.json")
     
     def _load_checkpoint(self):
-        """Load state from checkpoint if it exists."""
+        """Load state from checkpoint and replay the journal if they exist."""
         checkpoint_path = self._get_checkpoint_path()
-        if os.path.exists(checkpoint_path):
+        legacy_path = self._get_legacy_checkpoint_path()
+        if os.path.exists(checkpoint_path) or os.path.exists(legacy_path):
             try:
-                with open(checkpoint_path, 'r') as f:
-                    checkpoint = json.load(f)
-                    self.names = set(checkpoint.get('names', []))
-                    self.visited_prefixes = set(checkpoint.get('visited_prefixes', []))
-                    self.request_count = checkpoint.get('request_count', 0)
-                    self.logger.info(f"Loaded checkpoint for {self.version}: {len(self.names)} names, {len(self.visited_prefixes)} visited prefixes")
+                if os.path.exists(checkpoint_path):
+                    with open(checkpoint_path, 'rb') as f:
+                        checkpoint = pickle.load(f)
+                else:
+                    # Older runs wrote checkpoints as JSON
+                    with open(legacy_path, 'rb') as f:
+                        checkpoint = orjson.loads(f.read())
+                self.names = set(checkpoint.get('names', []))
+                # Older checkpoints stored every visited prefix instead of the frontier
+                self.visited_prefixes.update(checkpoint.get('visited_prefixes', []))
+                if 'pending' in checkpoint:
+                    self.pending = {prefix for prefix in checkpoint['pending']
+                                    if not _INVALID_PREFIX.search(prefix)}
+                self.request_count = checkpoint.get('request_count', 0)
+                self.logger.info(f"Loaded checkpoint for {self.version}: {len(self.names)} names, {len(self.pending or ())} pending prefixes")
             except Exception as e:
                 self.logger.error(f"Failed to load checkpoint: {str(e)}")
+        
+        if self.pending is None:
+            # Fresh start: begin the search from each character in the character set. An empty
+            # character is not a root: querying '' would make every root its child again.
+            self.pending = {char for char in self.get_character_set()
+                            if char and char not in self.visited_prefixes}
+        self.visited_prefixes.update(self.pending)
+        
+        journal_path = self._get_journal_path()
+        if os.path.exists(journal_path):
+            replayed = 0
+            try:
+                with open(journal_path, 'rb') as f:
+                    for line in f:
+                        entry = orjson.loads(line)
+                        self._apply_result(entry['prefix'], entry['names'])
+                        replayed += 1
+            except Exception as e:
+                # A torn final line from an interrupted run; everything before it is kept
+                self.logger.warning(f"Stopped replaying journal: {str(e)}")
+            self.logger.info(f"Replayed {replayed} journaled requests for {self.version}")
+            # Fold the journal into a fresh checkpoint so new entries don't follow a torn line
+            self._save_checkpoint()
+    
+    def _write_journal(self, prefix: str, names: List[str]):
+        """Append a completed request to the journal."""
+        try:
+            if self._journal is None:
+                self._journal = open(self._get_journal_path(), 'ab')
+            self._journal.write(orjson.dumps({'prefix': prefix, 'names': names}) + b"\n")
+            # Hand each entry to the OS so it survives the process being killed
+            self._journal.flush()
+        except Exception as e:
+            self.logger.error(f"Failed to write journal: {str(e)}")
+    
+    def _close_journal(self):
+        """Close the journal file if it is open."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
     
     def _save_checkpoint(self):
-        """Save current state to checkpoint."""
+        """Save current state to checkpoint and reset the journal."""
         checkpoint_path = self._get_checkpoint_path()
+        tmp_path = checkpoint_path + '.tmp'
         try:
-            with open(checkpoint_path, 'w') as f:
-                json.dump({
-                    'names': list(self.names),
-                    'visited_prefixes': list(self.visited_prefixes),
+            with open(tmp_path, 'wb') as f:
+                # Internal format only: pickle writes the sets directly, with no list copies
+                pickle.dump({
+                    'names': self.names,
+                    'pending': self.pending,
                     'request_count': self.request_count
-                }, f)
-            self.logger.debug(f"Saved checkpoint for {self.version}")
+                }, f, protocol=5)
+            # Swap atomically so an interrupted write never corrupts the checkpoint
+            os.replace(tmp_path, checkpoint_path)
+            # Everything journaled so far is now covered by the checkpoint
+            self._close_journal()
+            open(self._get_journal_path(), 'wb').close()
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Saved checkpoint for %s", self.version)
         except Exception as e:
             self.logger.error(f"Failed to save checkpoint: {str(e)}")
     
@@ -85,7 +190,7 @@ class BaseExtractor(ABC):
         except Exception as e:
             self.logger.error(f"Failed to save results: {str(e)}")
     
-    def get_suggestions(self, query: str) -> List[str]:
+    async def get_suggestions(self, query: str) -> List[str]:
         """
         Get autocomplete suggestions for a query with rate limiting.
 
@@ -94,33 +199,135 @@ class BaseExtractor(ABC):
 
         Returns:
             List of autocomplete suggestions
+
+        Raises:
+            TransientAPIError: If the query still fails after MAX_RETRIES retries, so
+                the prefix stays pending instead of being recorded as empty
         """
-        # Apply rate limiting
-        self.rate_limiter.wait_if_needed(self.version)
+        for attempt in range(self.MAX_RETRIES + 1):
+            # Apply rate limiting; retries take a token too, as each one uses up quota
+            await self.rate_limiter.wait_if_needed(self.version)
 
-        # Make the API request
-        response = self.api_client.get_autocomplete_suggestions(query, self.version)
+            # Make the API request
+            try:
+                response = await self.api_client.get_autocomplete_suggestions(query, self.version)
+                break
+            except TransientAPIError as e:
+                if attempt >= self.MAX_RETRIES:
+                    self.logger.error(f"Max retries reached for {query}")
+                    raise
+                wait_time = e.retry_after
+                if wait_time is None:
+                    wait_time = get_backoff(attempt, self.RETRY_BACKOFF)
+                if isinstance(e, RateLimitExceeded):
+                    # Hold back the whole version, then retry through the rate limiter
+                    self.logger.info(f"Pausing {self.version} for {wait_time:.2f} seconds before retry...")
+                    self.rate_limiter.get_limiter(self.version).pause(wait_time)
+                else:
+                    self.logger.info(f"Waiting {wait_time:.2f} seconds before retry...")
+                    await asyncio.sleep(wait_time)
 
-        # Debug logging
-        self.logger.debug(f"Query: {query}, Got {len(response)} suggestions")
-        if response and len(response) > 0:
-            self.logger.debug(f"Sample results: {response[:3]}")
+        # Debug logging, skipped entirely unless a debug handler will use it
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Query: %s, Got %d suggestions", query, len(response))
+            if response:
+                self.logger.debug("Sample results: %s", response[:3])
+
+        return response
+
+    def _build_child_generator(self) -> Callable[[str, List[str]], List[str]]:
+        """
+        Build the function that gets the prefixes to explore below a queried prefix.
+
+        The function is specialized for this extractor: the result limit, character
+        set and visited set are bound once, and checks that can't fail for a valid
+        parent prefix are folded away.
+
+        Returns:
+            A function taking the queried prefix and the suggestions it returned, and
+            returning child prefixes that may hold names not seen yet, in character set order
+        """
+        max_results = self.get_max_results()
+        # Children of the longest prefixes would be too long, so they have none
+        max_parent_length = self.MAX_PREFIX_LENGTH - 1
+        # An empty character only reproduces the parent, which is always visited. A space
+        # is only valid as a root: appended to a valid prefix it is always a trailing space.
+        extensions = tuple(char for char in self.get_character_set() if char and char != ' ')
+        visited = self.visited_prefixes
+        logger = self.logger
+
+        def get_children(prefix: str, suggestions: List[str]) -> List[str]:
+            # If we got fewer than max results, we've found all names with this prefix
+            if len(suggestions) < max_results:
+                # No need to explore deeper from this prefix
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Prefix '%s' returned %d results (< max). Not exploring deeper.", prefix, len(suggestions))
+                return []
+
+            # Skip children that are too long or start with a space
+            if len(prefix) > max_parent_length or prefix[0] == ' ':
+                return []
+
+            # Suggestions come back sorted, so every name with this prefix that sorts
+            # before the last suggestion has already been returned. Children below the
+            # last suggestion's next character can't hold anything new.
+            last = suggestions[-1]
+            if len(last) > len(prefix) and last.startswith(prefix):
+                pivot = last[len(prefix)]
+            else:
+                pivot = ''
+
+            # Explore deeper by appending each character, skipping prefixes already scheduled
+            return [prefix + char for char in extensions
+                    if char >= pivot and prefix + char not in visited]
+
+        return get_children
+
+    def _apply_result(self, prefix: str, suggestions: List[str]) -> List[str]:
+        """
+        Update state with the result of a query.
 
-        # Update state
+        Args:
+            prefix: The queried prefix
+            suggestions: The suggestions it returned
+
+        Returns:
+            Child prefixes that were added to the frontier
+        """
+        children = self._get_children(prefix, suggestions)
         self.request_count += 1
-        self.visited_prefixes.add(query)
-        self.names.update(response)
+        self.names.update(suggestions)
+        self.pending.discard(prefix)
+        # Mark children as visited as they are scheduled, so concurrent workers never queue them twice
+        self.visited_prefixes.update(children)
+        self.pending.update(children)
+        return children
+
+    def _record_result(self, prefix: str, suggestions: List[str]) -> List[str]:
+        """
+        Update state with the result of a query, journal it and checkpoint periodically.
+
+        Args:
+            prefix: The queried prefix
+            suggestions: The suggestions it returned
+
+        Returns:
+            Child prefixes to explore next
+        """
+        children = self._apply_result(prefix, suggestions)
+        self._write_journal(prefix, suggestions)
 
         # Save checkpoint periodically
-        if self.request_count % 20 == 0:  # Increased frequency for debugging
-           self._save_checkpoint()
-           self.logger.info(f"{self.version}: {self.request_count} requests, {len(self.names)} names found")
+        if self.request_count % self.CHECKPOINT_INTERVAL == 0:
+            self._save_checkpoint()
+        if self.request_count % self.PROGRESS_INTERVAL == 0:
+            self.logger.info(f"{self.version}: {self.request_count} requests, {len(self.names)} names found")
 
-        return response
+        return children
 
     
     @abstractmethod
-    def get_character_set(self) -> List[str]:
+    def get_character_set(self) -> Sequence[str]:
         """Get the character set for this API version."""
         pass
     
@@ -129,60 +336,53 @@ class BaseExtractor(ABC):
         """Get the maximum number of results returned by this API version."""
         pass
     
-    def extract_names(self):
-        """Extract all names using DFS approach."""
+    async def extract_names(self):
+        """Extract all names, querying the shortest pending prefixes first."""
+        try:
+            await ExtractionScheduler([self]).run()
+        finally:
+            # Running on its own, nothing else will close the shared client
+            await self.api_client.close()
+    
+    def start_extraction(self):
+        """Log the start of an extraction run."""
         self.logger.info(f"Starting extraction for {self.version}")
-        start_time = time.time()
-        
-        # Start DFS with each character in the character set
-        for char in self.get_character_set():
-            if char not in self.visited_prefixes:
-                self._dfs(char)
-        
-        # Save final results
+        self._start_time = time.time()
+    
+    def finish_extraction(self) -> bool:
+        """
+        Save final state and results and log a summary of the run.
+
+        Returns:
+            True if the search finished, False if prefixes were left unexplored
+        """
         self._save_checkpoint()
+        self._close_journal()
+        if self.pending:
+            # Prefixes that failed are still pending; writing results now would
+            # present a partial search as complete
+            self.logger.error(f"Extraction for {self.version} incomplete: {len(self.pending)} prefixes could not be explored. Run again to resume from the checkpoint.")
+            return False
+
+        # Save final results
         self._save_results()
         
-        elapsed_time = time.time() - start_time
+        elapsed_time = time.time() - self._start_time
         self.logger.info(f"Completed extraction for {self.version}")
         self.logger.info(f"Total requests: {self.request_count}")
         self.logger.info(f"Total names: {len(self.names)}")
         self.logger.info(f"Elapsed time: {elapsed_time:.2f} seconds")
+        return True
     
-    def _dfs(self, prefix: str):
+    async def explore(self, prefix: str) -> List[str]:
         """
-        Perform depth-first search starting with the given prefix.
+        Query a pending prefix and record its result.
 
         Args:
-            prefix: The current prefix to explore
-        """
-        if prefix in self.visited_prefixes:
-            return
-        
-        self.visited_prefixes.add(prefix)
-
-        # Skip consecutive spaces - they cause traversal problems
-        if '  ' in prefix:
-            return
-        
-        # Skip if prefix has leading/trailing spaces (except single space prefix)
-        if (prefix.startswith(' ') or prefix.endswith(' ')) and len(prefix) > 1:
-            return
-        
-        #
-        suggestions = self.get_suggestions(prefix)
-
-
-        # If we got the maximum number of results, there might be more names with this prefix
-        if len(suggestions) >= self.get_max_results():
-            # Explore deeper by appending each character
-            for char in self.get_character_set():
-                next_prefix = prefix + char
-                # Skip if the resulting prefix is too long or problematic
-                if len(next_prefix) <= 10:
-                    self._dfs(next_prefix)
-        else:
-            # If we got fewer than max results, we've found all names with this prefix
-            # No need to explore deeper from this prefix
-            self.logger.debug(f"Prefix '{prefix}' returned {len(suggestions)} results (< max). Not exploring deeper.")
+            prefix: The prefix to explore
 
+        Returns:
+            Child prefixes to explore next, empty if the prefix holds no more names
+        """
+        suggestions = await self.get_suggestions(prefix)
+        return self._record_result(prefix, suggestions)
@@ -2,12 +2,16 @@ import os
 import json
 import logging
 import argparse
+import asyncio
 import time
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List
 import concurrent.futures
 
 
+from src.api_client import SHARED_CLIENT
+from src.scheduler import ExtractionScheduler
+from src.utils.rate_limiter import VersionedRateLimiter
 from src.utils.logger import setup_logger
 from src.extractors import V1Extractor, V2Extractor, V3Extractor
 
@@ -23,12 +27,24 @@ def parse_args():
     parser.add_argument('--versions', type=str, default='v1,v2,v3',
                         help='API versions to extract from (comma-separated)')
     parser.add_argument('--parallel', action='store_true',
-                        help='Run extractors in parallel')
+                        help='Run each extractor in its own process instead of sharing one event loop')
     return parser.parse_args()
 
 def run_extractor(extractor_class, checkpoint_dir, results_dir):
-    extractor = extractor_class(checkpoint_dir, results_dir)
-    extractor.extract_names()
+    """Run a single extractor on its own event loop; the entry point for worker processes."""
+    # Worker processes that were spawned rather than forked start without logging set up
+    if not logging.getLogger().handlers:
+        setup_logger()
+    return asyncio.run(run_extractors([extractor_class], checkpoint_dir, results_dir))
+
+async def run_extractors(extractor_classes, checkpoint_dir, results_dir):
+    extractors = [extractor_class(checkpoint_dir, results_dir) for extractor_class in extractor_classes]
+    try:
+        # One set of budgets per run, created on the loop that will use it
+        return await ExtractionScheduler(extractors, VersionedRateLimiter()).run()
+    finally:
+        # The extractors share one client, so close it once they are all done
+        await SHARED_CLIENT.close()
 
 def main():
     args = parse_args()
@@ -42,19 +58,26 @@ def main():
     
     versions = args.versions.split(',')
     
+    complete = True
     # Add proper KeyboardInterrupt handling
     try:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(versions)) as executor:
-            futures = []
-            for version in versions:
-                if version in extractors:
-                    future = executor.submit(run_extractor, extractors[version], args.checkpoint_dir, args.results_dir)
-                    futures.append(future)
-            
-            concurrent.futures.wait(futures)
+        extractor_classes = [extractors[version] for version in versions if version in extractors]
+        if args.parallel and extractor_classes:
+            # Extractors share no state besides their own checkpoint files, so each can
+            # run on its own core without contending for the GIL
+            with ProcessPoolExecutor(max_workers=len(extractor_classes)) as executor:
+                futures = [executor.submit(run_extractor, extractor_class, args.checkpoint_dir, args.results_dir)
+                           for extractor_class in extractor_classes]
+                for future in concurrent.futures.as_completed(futures):
+                    complete = future.result() and complete
+        else:
+            complete = asyncio.run(run_extractors(extractor_classes, args.checkpoint_dir, args.results_dir))
     except KeyboardInterrupt:
         logger.info("Extraction stopped by user. Saving progress...")
         # Let the program exit gracefully
+    
+    if not complete:
+        logger.error("Some extractions left prefixes unexplored and did not update their results. Run again to resume.")
         
     # Aggregate results
     total_names = set()
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from src.utils.rate_limiter import VersionedRateLimiter
+
+class ExtractionScheduler:
+    """
+    Runs extractors concurrently on one event loop.
+
+    Each extractor's pending prefixes go into a priority queue that hands out
+    the shortest prefixes first, so every version covers the top of its search
+    space early instead of finishing one deep branch at a time. Each queue is
+    drained by a pool of workers sized to that version's concurrency; workers
+    pace their requests through a rate limiter the scheduler can share across
+    versions.
+    """
+    
+    def __init__(self, extractors: List, rate_limiter: Optional[VersionedRateLimiter] = None):
+        """
+        Args:
+            extractors: The extractors to run
+            rate_limiter: Per-version budgets for this run, handed to every extractor.
+                If not given, each extractor keeps its own limiter.
+        """
+        self.extractors = list(extractors)
+        self.rate_limiter = rate_limiter
+        if rate_limiter is not None:
+            for extractor in self.extractors:
+                extractor.rate_limiter = rate_limiter
+        self.logger = logging.getLogger(__name__)
+    
+    async def run(self) -> bool:
+        """
+        Run all extractors until each has no pending prefixes left.
+
+        Returns:
+            True if every extractor finished, False if any left prefixes unexplored
+        """
+        results = await asyncio.gather(*[self._run_extractor(extractor) for extractor in self.extractors])
+        return all(results)
+    
+    async def _run_extractor(self, extractor) -> bool:
+        """
+        Drain one extractor's pending prefixes with a pool of workers.
+
+        Args:
+            extractor: The extractor to run
+
+        Returns:
+            True if the extractor finished, False if prefixes that failed were left pending
+        """
+        extractor.start_extraction()
+
+        queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        for prefix in extractor.pending:
+            queue.put_nowait(self._priority(prefix))
+
+        workers = [asyncio.create_task(self._worker(extractor, queue))
+                   for _ in range(extractor.concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        # Failed prefixes leave the queue but stay pending, so the run can be resumed
+        return extractor.finish_extraction()
+    
+    @staticmethod
+    def _priority(prefix: str) -> Tuple[int, str]:
+        """Order prefixes by length, then alphabetically."""
+        return (len(prefix), prefix)
+    
+    async def _worker(self, extractor, queue: asyncio.PriorityQueue):
+        """
+        Explore prefixes from the queue until cancelled.
+
+        Args:
+            extractor: The extractor the prefixes belong to
+            queue: Priority queue of the extractor's pending prefixes
+        """
+        while True:
+            _, prefix = await queue.get()
+            try:
+                for next_prefix in await extractor.explore(prefix):
+                    queue.put_nowait(self._priority(next_prefix))
+            except Exception as e:
+                self.logger.error(f"Failed to explore prefix '{prefix}' for {extractor.version}: {str(e)}")
+            finally:
+                queue.task_done()
@@ -1,39 +1,82 @@
+import asyncio
+import random
 import time
 import logging
-from typing import Dict
-from collections import deque
+from typing import Dict, Optional
+
+# Upper bound in seconds on a single backoff delay
+MAX_BACKOFF = 60
+
+def get_backoff(attempt: int, backoff_factor: float) -> float:
+    """
+    Get an exponential backoff delay with jitter for a retry attempt.
+
+    Half of the delay is fixed and half is random, so concurrent callers
+    that failed together don't all retry at the same moment.
+    """
+    delay = min(MAX_BACKOFF, backoff_factor * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
 
 class RateLimiter:
     """
     Rate limiter to respect API constraints.
-    Uses a sliding window approach to track requests.
+    Uses a token bucket to pace requests at a steady rate.
     """
     
-    def __init__(self, requests_per_minute: int):
+    def __init__(self, requests_per_minute: int, burst: int = 1):
         self.requests_per_minute = requests_per_minute
         self.window_size = 60  # 1 minute in seconds
-        self.request_timestamps = deque()
+        # The API enforces a per-minute window, and a bucket can hand out up to
+        # `capacity` tokens on top of what it refills in that window. Keep the
+        # bucket small and take it out of the refill rate so the total never
+        # exceeds the limit.
+        self.capacity = max(1, min(burst, requests_per_minute - 1))
+        self.rate = (requests_per_minute - self.capacity) / self.window_size
+        self.tokens = float(self.capacity)
+        self.last = time.monotonic()
+        # Serializes concurrent callers so they don't all claim the same token.
+        # Created per event loop, as a lock can only be waited on from the loop it
+        # was first contended on and a shared limiter outlives each asyncio.run.
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         self.logger = logging.getLogger(__name__)
     
-    def wait_if_needed(self):
+    async def wait_if_needed(self):
         """
         Wait if necessary to respect the rate limit.
         """
-        current_time = time.time()
-        
-        # Remove timestamps older than the window size
-        while self.request_timestamps and self.request_timestamps[0] < current_time - self.window_size:
-            self.request_timestamps.popleft()
-        
-        # If we've reached the limit, wait until we can make another request
-        if len(self.request_timestamps) >= self.requests_per_minute:
-            wait_time = self.request_timestamps[0] + self.window_size - current_time
-            if wait_time > 0:
-                self.logger.debug(f"Rate limit reached. Waiting {wait_time:.2f} seconds")
-                time.sleep(wait_time)
-        
-        # Add the current request timestamp
-        self.request_timestamps.append(time.time())
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            self._refill()
+            # Recheck after each wait, as a pause may have pushed the next token further out
+            while self.tokens < 1:
+                # Wait for the next token to be refilled, then spend it
+                wait_time = (1 - self.tokens) / self.rate
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("Rate limit reached. Waiting %.2f seconds", wait_time)
+                await asyncio.sleep(wait_time)
+                self._refill()
+            self.tokens -= 1
+    
+    def pause(self, seconds: float):
+        """
+        Hold back every caller for at least the given number of seconds.
+
+        Used when the server reports that the limit was exceeded anyway, so all
+        requests for this version back off together instead of each retrying on its own.
+        """
+        self._refill()
+        # Pauses reported by concurrent requests overlap rather than add up
+        self.tokens = min(self.tokens, -seconds * self.rate)
+    
+    def _refill(self):
+        """Add the tokens accumulated since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
 
 class VersionedRateLimiter:
     """
@@ -47,12 +90,18 @@ class VersionedRateLimiter:
             "v3": RateLimiter(80)    # 80 requests per minute
         }
     
-    def wait_if_needed(self, version: str):
+    def get_limiter(self, version: str) -> RateLimiter:
+        """
+        Get the rate limiter for a specific API version.
+        """
+        # Default to the most restrictive rate limit
+        return self.limiters.get(version, self.limiters["v2"])
+    
+    async def wait_if_needed(self, version: str):
         """
         Wait if necessary to respect the rate limit for a specific API version.
         """
-        if version in self.limiters:
-            self.limiters[version].wait_if_needed()
-        else:
-            # Default to the most restrictive rate limit
-            self.limiters["v2"].wait_if_needed()
+        await self.get_limiter(version).wait_if_needed()
+
+# Shared by all extractors so they draw on the same per-version budgets
+SHARED_LIMITER = VersionedRateLimiter()
@@ -0,0 +1,272 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import orjson
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.api_client import AutocompleteAPIClient, RateLimitExceeded, TransientAPIError, _parse_retry_after
+from src.extractors import V1Extractor
+from src.utils.rate_limiter import RateLimiter, VersionedRateLimiter
+
+
+async def _query(handler, query="ab", version="v1"):
+    """Query a local server that answers every autocomplete request with the given handler."""
+    app = web.Application()
+    app.router.add_get(f"/{version}/autocomplete", handler)
+    server = TestServer(app)
+    await server.start_server()
+    client = AutocompleteAPIClient(str(server.make_url("")))
+    try:
+        return await client.get_autocomplete_suggestions(query, version)
+    finally:
+        await client.close()
+        await server.close()
+
+
+def test_parse_response_list():
+    client = AutocompleteAPIClient()
+    assert client._parse_response("v1", b'["aa", "ab"]') == ["aa", "ab"]
+
+
+@pytest.mark.parametrize("field", ["results", "suggestions", "names"])
+def test_parse_response_dict(field):
+    client = AutocompleteAPIClient()
+    body = orjson.dumps({"count": 2, field: ["aa", "ab"]})
+    assert client._parse_response("v1", body) == ["aa", "ab"]
+
+
+def test_parse_response_unknown_shape():
+    client = AutocompleteAPIClient()
+    assert client._parse_response("v1", b'{"count": 0}') == []
+    assert client._parse_response("v1", b'"aa"') == []
+    assert "v1" not in client._extractors
+
+
+def test_parse_response_changed_shape():
+    client = AutocompleteAPIClient()
+    assert client._parse_response("v1", b'["aa"]') == ["aa"]
+    # A list extractor cached from the first response must not accept a dict
+    assert client._parse_response("v1", b'{"results": ["ab"]}') == ["ab"]
+    # Nor may a field extractor cached from a dict accept a list or another field
+    assert client._parse_response("v1", b'["ac"]') == ["ac"]
+    assert client._parse_response("v1", b'{"results": ["ad"]}') == ["ad"]
+    assert client._parse_response("v1", b'{"names": ["ae"]}') == ["ae"]
+
+
+def test_parse_response_caches_per_version():
+    client = AutocompleteAPIClient()
+    assert client._parse_response("v1", b'["aa"]') == ["aa"]
+    assert client._parse_response("v2", b'{"results": ["ab"]}') == ["ab"]
+    assert client._parse_response("v1", b'["ac"]') == ["ac"]
+
+
+def test_parse_retry_after_seconds():
+    assert _parse_retry_after("3") == 3.0
+    assert _parse_retry_after(" 0 ") == 0.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < _parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    # A date in the past means retry now
+    retry_at = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert _parse_retry_after(format_datetime(retry_at, usegmt=True)) == 0.0
+
+
+@pytest.mark.parametrize("value", [None, "", "soon", "-1", "1.5", "Mon, 99 Foo 2025"])
+def test_parse_retry_after_malformed(value):
+    assert _parse_retry_after(value) is None
+
+
+def test_list_response():
+    async def handler(request):
+        return web.json_response(["aa", "ab"])
+
+    assert asyncio.run(_query(handler)) == ["aa", "ab"]
+
+
+def test_dict_response():
+    async def handler(request):
+        return web.json_response({"version": "v1", "count": 1, "results": [request.query["query"]]})
+
+    assert asyncio.run(_query(handler, query="a b")) == ["a b"]
+
+
+def test_rate_limit_raises():
+    async def handler(request):
+        return web.Response(status=429, text="slow down", headers={"Retry-After": "7"})
+
+    with pytest.raises(RateLimitExceeded) as e:
+        asyncio.run(_query(handler, version="v2"))
+    assert e.value.version == "v2"
+    assert e.value.retry_after == 7.0
+
+
+def test_rate_limit_without_retry_after():
+    async def handler(request):
+        return web.Response(status=429)
+
+    with pytest.raises(RateLimitExceeded) as e:
+        asyncio.run(_query(handler))
+    assert e.value.retry_after is None
+
+
+def test_server_error_raises_transient_error():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.query["query"])
+        return web.Response(status=503, headers={"Retry-After": "2"})
+
+    with pytest.raises(TransientAPIError) as e:
+        asyncio.run(_query(handler))
+    assert not isinstance(e.value, RateLimitExceeded)
+    assert e.value.retry_after == 2.0
+    # Retrying is left to the caller, so the client sent the request once
+    assert calls == ["ab"]
+
+
+def test_connection_error_raises_transient_error():
+    async def query_closed_port():
+        client = AutocompleteAPIClient("http://127.0.0.1:9")
+        try:
+            return await client.get_autocomplete_suggestions("ab")
+        finally:
+            await client.close()
+
+    with pytest.raises(TransientAPIError) as e:
+        asyncio.run(query_closed_port())
+    assert e.value.retry_after is None
+
+
+def test_malformed_body_raises_transient_error():
+    async def handler(request):
+        return web.Response(status=200, body=b'["aa", "a')
+
+    with pytest.raises(TransientAPIError):
+        asyncio.run(_query(handler))
+
+
+def test_client_error_returns_empty():
+    async def handler(request):
+        return web.Response(status=404)
+
+    assert asyncio.run(_query(handler)) == []
+
+
+def test_pause_holds_back_callers():
+    limiter = RateLimiter(6000)
+
+    async def wait_after_pause():
+        await limiter.wait_if_needed()
+        limiter.pause(0.2)
+        # Overlapping pauses don't add up
+        limiter.pause(0.2)
+        start = time.monotonic()
+        await limiter.wait_if_needed()
+        return time.monotonic() - start
+
+    assert 0.2 <= asyncio.run(wait_after_pause()) < 0.4
+
+
+class _RateLimitedClient:
+    """Fake API client that rejects the first requests for exceeding the rate limit."""
+
+    def __init__(self, rejections, retry_after=None):
+        self.rejections = rejections
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def _error(self, version):
+        return RateLimitExceeded(version, self.retry_after)
+
+    async def get_autocomplete_suggestions(self, query, version="v1"):
+        self.calls += 1
+        if self.calls <= self.rejections:
+            raise self._error(version)
+        return [query + "a"]
+
+
+class _FlakyClient(_RateLimitedClient):
+    """Fake API client whose first requests fail with a transient server error."""
+
+    def _error(self, version):
+        return TransientAPIError(version, "Server error 503", self.retry_after)
+
+
+def _paused_extractor(tmp_path, client):
+    """Make a v1 extractor on a fast rate limiter that records its pauses and tokens taken."""
+    extractor = V1Extractor(str(tmp_path / "checkpoints"), str(tmp_path / "results"))
+    extractor.api_client = client
+    extractor.rate_limiter = VersionedRateLimiter()
+    limiter = extractor.rate_limiter.limiters["v1"] = RateLimiter(60000)
+    pauses = []
+    pause = limiter.pause
+    wait_if_needed = limiter.wait_if_needed
+
+    def record_pause(seconds):
+        pauses.append(seconds)
+        pause(seconds)
+
+    async def record_wait():
+        limiter.tokens_taken += 1
+        await wait_if_needed()
+
+    limiter.tokens_taken = 0
+    limiter.pause = record_pause
+    limiter.wait_if_needed = record_wait
+    return extractor, pauses
+
+
+def test_rate_limit_pauses_version(tmp_path):
+    client = _RateLimitedClient(rejections=2, retry_after=0.05)
+    extractor, pauses = _paused_extractor(tmp_path, client)
+
+    assert asyncio.run(extractor.get_suggestions("b")) == ["ba"]
+    assert pauses == [0.05, 0.05]
+    assert client.calls == 3
+
+
+def test_rate_limit_backoff_without_retry_after(tmp_path):
+    client = _RateLimitedClient(rejections=1)
+    extractor, pauses = _paused_extractor(tmp_path, client)
+    extractor.RETRY_BACKOFF = 0.1
+
+    assert asyncio.run(extractor.get_suggestions("b")) == ["ba"]
+    assert len(pauses) == 1 and 0.05 <= pauses[0] <= 0.1
+
+
+def test_rate_limit_gives_up(tmp_path):
+    client = _RateLimitedClient(rejections=100, retry_after=0)
+    extractor, pauses = _paused_extractor(tmp_path, client)
+
+    # Giving up raises, so the prefix stays pending instead of being recorded as empty
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(extractor.get_suggestions("b"))
+    assert len(pauses) == extractor.MAX_RETRIES
+    assert client.calls == extractor.MAX_RETRIES + 1
+
+
+def test_transient_errors_retry_through_limiter(tmp_path):
+    client = _FlakyClient(rejections=3, retry_after=0)
+    extractor, pauses = _paused_extractor(tmp_path, client)
+
+    assert asyncio.run(extractor.get_suggestions("b")) == ["ba"]
+    assert client.calls == 4
+    # Every retry takes a token, but only rate limits hold back the whole version
+    assert extractor.rate_limiter.limiters["v1"].tokens_taken == 4
+    assert pauses == []
+
+
+def test_transient_errors_give_up(tmp_path):
+    client = _FlakyClient(rejections=100, retry_after=0)
+    extractor, pauses = _paused_extractor(tmp_path, client)
+
+    with pytest.raises(TransientAPIError):
+        asyncio.run(extractor.get_suggestions("b"))
+    assert client.calls == extractor.MAX_RETRIES + 1
+    assert extractor.rate_limiter.limiters["v1"].tokens_taken == extractor.MAX_RETRIES + 1
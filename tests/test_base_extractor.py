@@ -0,0 +1,334 @@
+import asyncio
+import contextlib
+import os
+import pickle
+import random
+from typing import Tuple
+
+import orjson
+import pytest
+
+from src.extractors.base_extractor import BaseExtractor
+from src.scheduler import ExtractionScheduler
+from src.utils.rate_limiter import RateLimiter, VersionedRateLimiter
+
+CHARSET = ('a', 'b', 'c')
+
+
+class FakeAPI:
+    """In-memory autocomplete API returning sorted, truncated pages of prefix matches."""
+
+    def __init__(self, names, max_results):
+        self.names = sorted(set(names))
+        self.max_results = max_results
+        # Every query made, with the page it returned
+        self.queries = []
+        self.closed = False
+
+    async def get_autocomplete_suggestions(self, query, version="v1"):
+        page = [name for name in self.names if name.startswith(query)][:self.max_results]
+        self.queries.append((query, page))
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeExtractor(BaseExtractor):
+    """Extractor over a small character set with a configurable page size."""
+
+    def __init__(self, checkpoint_dir: str, results_dir: str, max_results: int):
+        self._max_results = max_results
+        super().__init__("v1", checkpoint_dir, results_dir)
+
+    def get_character_set(self) -> Tuple[str, ...]:
+        return CHARSET
+
+    def get_max_results(self) -> int:
+        return self._max_results
+
+
+def make_extractor(tmp_path, api):
+    """Make an extractor that queries the fake API without rate limiting."""
+    extractor = FakeExtractor(str(tmp_path / "checkpoints"), str(tmp_path / "results"), api.max_results)
+    extractor.api_client = api
+    extractor.rate_limiter = VersionedRateLimiter()
+    extractor.rate_limiter.limiters["v1"] = RateLimiter(10 ** 9)
+    return extractor
+
+
+def random_names(count, seed=0):
+    """Make a reproducible set of names over the fake character set."""
+    rng = random.Random(seed)
+    return {''.join(rng.choice(CHARSET) for _ in range(rng.randint(1, 6))) for _ in range(count)}
+
+
+def run(extractor):
+    asyncio.run(ExtractionScheduler([extractor]).run())
+
+
+@pytest.fixture
+def extractor(tmp_path):
+    return make_extractor(tmp_path, FakeAPI([], max_results=3))
+
+
+def test_children_of_short_page(extractor):
+    assert extractor._get_children('a', ['aa', 'ab']) == []
+
+
+def test_children_skip_below_pivot(extractor):
+    # Everything with prefix 'a' up to 'abc' was returned, so 'aa' has nothing new
+    assert extractor._get_children('a', ['aa', 'aab', 'abc']) == ['ab', 'ac']
+    assert extractor._get_children('a', ['ab', 'aba', 'acb']) == ['ac']
+
+
+def test_children_when_last_is_the_prefix(extractor):
+    extractor._max_results = 1
+    extractor._get_children = extractor._build_child_generator()
+    assert extractor._get_children('a', ['a']) == ['aa', 'ab', 'ac']
+
+
+def test_children_when_last_does_not_extend_prefix(extractor):
+    # A page that isn't purely prefix matches gives no pivot, so nothing is skipped
+    assert extractor._get_children('b', ['ba', 'bc', 'ca']) == ['ba', 'bb', 'bc']
+
+
+def test_children_skip_visited(extractor):
+    extractor.visited_prefixes.add('ab')
+    assert extractor._get_children('a', ['aaa', 'aab', 'aac']) == ['aa', 'ac']
+
+
+def test_children_of_longest_prefix(extractor):
+    prefix = 'a' * extractor.MAX_PREFIX_LENGTH
+    assert extractor._get_children(prefix, [prefix + 'a', prefix + 'b', prefix + 'c']) == []
+
+
+@pytest.mark.parametrize("max_results", [1, 3, 5])
+def test_finds_every_name(tmp_path, max_results):
+    names = random_names(300)
+    api = FakeAPI(names, max_results)
+    extractor = make_extractor(tmp_path, api)
+    run(extractor)
+
+    assert extractor.names == names
+    assert extractor.pending == set()
+    queried = [query for query, _ in api.queries]
+    assert len(queried) == len(set(queried)) == extractor.request_count
+
+
+@pytest.mark.parametrize("max_results", [1, 3, 5])
+def test_never_queries_below_pivot(tmp_path, max_results):
+    api = FakeAPI(random_names(300), max_results)
+    run(make_extractor(tmp_path, api))
+
+    queried = {query for query, _ in api.queries}
+    for prefix, page in api.queries:
+        if len(page) < max_results:
+            assert not any(query.startswith(prefix) and query != prefix for query in queried)
+            continue
+        last = page[-1]
+        if len(last) > len(prefix):
+            pivot = last[len(prefix)]
+            for char in CHARSET:
+                if char < pivot:
+                    assert prefix + char not in queried
+
+
+def test_extract_names_closes_client(tmp_path):
+    names = random_names(50)
+    api = FakeAPI(names, max_results=3)
+    extractor = make_extractor(tmp_path, api)
+    asyncio.run(extractor.extract_names())
+
+    assert extractor.names == names
+    assert api.closed
+
+
+def test_runs_share_limiter_across_event_loops(tmp_path):
+    # Slow enough that the workers contend for the limiter's lock
+    limiter = VersionedRateLimiter()
+    limiter.limiters["v1"] = RateLimiter(60000)
+    names = random_names(50)
+    for run_dir in ("first", "second"):
+        extractor = make_extractor(tmp_path / run_dir, FakeAPI(names, max_results=3))
+        extractor.rate_limiter = limiter
+        run(extractor)
+
+        assert extractor.names == names
+        assert extractor.pending == set()
+
+
+class FailingAPI(FakeAPI):
+    """Fake API that fails every query for the given prefixes."""
+
+    def __init__(self, names, max_results, failing):
+        super().__init__(names, max_results)
+        self.failing = set(failing)
+
+    async def get_autocomplete_suggestions(self, query, version="v1"):
+        if query in self.failing:
+            raise RuntimeError(f"Failed query {query}")
+        return await super().get_autocomplete_suggestions(query, version)
+
+
+def test_failed_prefixes_leave_run_incomplete(tmp_path):
+    names = random_names(100)
+    extractor = make_extractor(tmp_path, FailingAPI(names, 3, failing={'b'}))
+    assert not asyncio.run(ExtractionScheduler([extractor]).run())
+
+    assert extractor.pending == {'b'}
+    assert not any(name.startswith('b') for name in extractor.names)
+    # Results are only written for a finished search
+    assert not os.path.exists(tmp_path / "results" / "v1_names.json")
+
+    # The failed prefix is checkpointed, so a later run picks it up
+    api = FakeAPI(names, 3)
+    extractor = make_extractor(tmp_path, api)
+    assert asyncio.run(ExtractionScheduler([extractor]).run())
+    assert extractor.names == names
+    assert api.queries[0][0] == 'b'
+    assert os.path.exists(tmp_path / "results" / "v1_names.json")
+
+
+def test_scheduler_shares_its_limiter(tmp_path):
+    limiter = VersionedRateLimiter()
+    extractors = [make_extractor(tmp_path / run_dir, FakeAPI([], 3)) for run_dir in ("first", "second")]
+    ExtractionScheduler(extractors, limiter)
+
+    assert all(extractor.rate_limiter is limiter for extractor in extractors)
+
+
+def test_finds_names_equal_to_prefix(tmp_path):
+    # With one result per page the last suggestion is often the prefix itself
+    names = {'a', 'aa', 'aab', 'ab', 'b', 'ba', 'c'}
+    api = FakeAPI(names, max_results=1)
+    extractor = make_extractor(tmp_path, api)
+    run(extractor)
+
+    assert extractor.names == names
+
+
+class InterruptedAPI(FakeAPI):
+    """Fake API that stops answering after a number of queries, like a killed run."""
+
+    def __init__(self, names, max_results, limit):
+        super().__init__(names, max_results)
+        self.limit = limit
+        self.stopped = None
+
+    async def get_autocomplete_suggestions(self, query, version="v1"):
+        if len(self.queries) >= self.limit:
+            self.stopped.set()
+            await asyncio.Future()
+        return await super().get_autocomplete_suggestions(query, version)
+
+
+def interrupt(extractor):
+    """Run an extractor on an InterruptedAPI and cancel it once the API stops answering."""
+    async def run_until_stopped():
+        extractor.api_client.stopped = asyncio.Event()
+        task = asyncio.ensure_future(ExtractionScheduler([extractor]).run())
+        await extractor.api_client.stopped.wait()
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run_until_stopped())
+
+
+NAMES = random_names(300)
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    """Request count of an uninterrupted run over NAMES."""
+    extractor = make_extractor(tmp_path_factory.mktemp("reference"), FakeAPI(NAMES, 3))
+    run(extractor)
+    return extractor.request_count
+
+
+def make_interrupted(tmp_path, limit):
+    """
+    Make an extractor that checkpoints often and interrupt its run after `limit` queries.
+
+    The extractor is returned so its journal stays open and unclosed while the run is
+    resumed, as it would be after the process was killed.
+    """
+    extractor = make_extractor(tmp_path, InterruptedAPI(NAMES, 3, limit))
+    extractor.CHECKPOINT_INTERVAL = 7
+    interrupt(extractor)
+    return extractor
+
+
+def resume(tmp_path, reference, queried):
+    """Resume a run and check it finishes without repeating any of the `queried` requests."""
+    api = FakeAPI(NAMES, 3)
+    extractor = make_extractor(tmp_path, api)
+    run(extractor)
+
+    assert extractor.names == NAMES
+    assert extractor.pending == set()
+    assert extractor.request_count == reference
+    assert queried + len(api.queries) == reference
+    return extractor
+
+
+@pytest.mark.parametrize("limit", [1, 6, 7, 8, 30, 50])
+def test_resume(tmp_path, reference, limit):
+    interrupted = make_interrupted(tmp_path, limit)
+    assert len(interrupted.api_client.queries) == limit
+    # Requests since the last checkpoint are only in the journal
+    with open(tmp_path / "checkpoints" / "v1_names.jsonl", 'rb') as f:
+        assert len(f.readlines()) == limit % 7
+    resume(tmp_path, reference, limit)
+
+
+def test_resume_twice(tmp_path, reference):
+    # Keep both interrupted extractors alive so neither journal is closed
+    first = make_interrupted(tmp_path, 10)
+    second = make_interrupted(tmp_path, 15)
+    resume(tmp_path, reference, 25)
+
+
+def test_resume_after_torn_journal_line(tmp_path, reference):
+    interrupted = make_interrupted(tmp_path, 10)
+    journal_path = tmp_path / "checkpoints" / "v1_names.jsonl"
+    with open(journal_path, 'ab') as f:
+        f.write(b'{"prefix": "ab", "na')
+
+    extractor = make_extractor(tmp_path, FakeAPI(NAMES, 3))
+    # The journal is folded into a checkpoint on load, so new entries don't follow the torn line
+    assert os.path.getsize(journal_path) == 0
+    assert extractor.request_count == 10
+    resume(tmp_path, reference, 10)
+
+
+def test_resume_from_legacy_json_checkpoint(tmp_path, reference):
+    interrupted = make_interrupted(tmp_path, 10)
+    # Loading folds the journal into a checkpoint; rewrite that as an older run would have
+    make_extractor(tmp_path, FakeAPI(NAMES, 3))
+    checkpoint_path = tmp_path / "checkpoints" / "v1_checkpoint.pkl"
+    with open(checkpoint_path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    with open(tmp_path / "checkpoints" / "v1_checkpoint.json", 'wb') as f:
+        f.write(orjson.dumps({
+            'names': list(checkpoint['names']),
+            'pending': list(checkpoint['pending']),
+            'request_count': checkpoint['request_count']
+        }))
+    os.remove(checkpoint_path)
+
+    resume(tmp_path, reference, 10)
+
+
+def test_load_legacy_visited_checkpoint(tmp_path):
+    # The oldest checkpoints stored every visited prefix and no frontier
+    os.makedirs(tmp_path / "checkpoints")
+    with open(tmp_path / "checkpoints" / "v1_checkpoint.json", 'wb') as f:
+        f.write(orjson.dumps({'names': ['aa', 'ab'], 'visited_prefixes': ['a', 'b'], 'request_count': 2}))
+
+    extractor = make_extractor(tmp_path, FakeAPI([], 3))
+    assert extractor.names == {'aa', 'ab'}
+    assert extractor.request_count == 2
+    assert extractor.pending == {'c'}
+    assert {'a', 'b', 'c'} <= extractor.visited_prefixes
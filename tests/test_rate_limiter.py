@@ -0,0 +1,105 @@
+import asyncio
+import bisect
+import types
+
+import pytest
+
+from src.utils import rate_limiter
+from src.utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+    """Monotonic clock that only moves when the limiter sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        # Real sleeps never wake early; overshooting a little also keeps float
+        # rounding from leaving the limiter a hair short of a token forever
+        self.now += seconds + 1e-6
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rate_limiter, "asyncio", types.SimpleNamespace(
+        Lock=asyncio.Lock, get_running_loop=asyncio.get_running_loop, sleep=clock.sleep))
+    return clock
+
+
+def request_times(clock, limiter, count, workers=4):
+    """Take `count` tokens from the limiter with concurrent workers and return when each was granted."""
+    times = []
+
+    async def worker():
+        while len(times) < count:
+            await limiter.wait_if_needed()
+            times.append(clock.now)
+
+    async def run():
+        await asyncio.gather(*[worker() for _ in range(workers)])
+
+    asyncio.run(run())
+    return sorted(times)
+
+
+def busiest_window(times, window=60):
+    """Most requests granted in any window of the given length."""
+    return max(bisect.bisect_left(times, start + window) - i for i, start in enumerate(times))
+
+
+@pytest.mark.parametrize("rpm", [50, 80, 100])
+@pytest.mark.parametrize("burst", [1, 5, 1000])
+def test_never_exceeds_limit_in_any_window(clock, rpm, burst):
+    limiter = RateLimiter(rpm, burst=burst)
+    times = request_times(clock, limiter, 5 * rpm)
+
+    assert busiest_window(times) <= rpm
+    # The limit is used, not just respected
+    assert busiest_window(times) >= rpm - 1
+
+
+def test_idle_bucket_does_not_overflow(clock):
+    limiter = RateLimiter(60, burst=5)
+    request_times(clock, limiter, 100)
+    # A long idle spell refills the bucket only up to its capacity
+    clock.now += 3600
+    idle_until = clock.now
+    times = request_times(clock, limiter, 200)
+
+    # The first five go out at once, then requests are paced again
+    assert times[4] == idle_until
+    assert times[5] > idle_until
+    assert busiest_window(times) <= 60
+
+
+@pytest.mark.parametrize("rpm, burst, capacity", [
+    (100, 1, 1),
+    (100, 10, 10),
+    (100, 1000, 99),
+    (50, 50, 49),
+    (2, 5, 1),
+])
+def test_burst_is_clamped(rpm, burst, capacity):
+    limiter = RateLimiter(rpm, burst=burst)
+    assert limiter.capacity == capacity
+    assert limiter.tokens == capacity
+    # Whatever the bucket holds is taken out of the refill rate
+    assert limiter.rate * 60 + limiter.capacity == pytest.approx(rpm)
+
+
+def test_limiter_reused_across_event_loops():
+    limiter = RateLimiter(60000)
+
+    async def contend():
+        await asyncio.gather(*[limiter.wait_if_needed() for _ in range(8)])
+
+    # A shared limiter outlives each asyncio.run; its lock must follow the new loop
+    asyncio.run(contend())
+    asyncio.run(contend())